@@ -0,0 +1,144 @@
+/* C implementation of the fqstat record counter.
+ *
+ * count_records walks a buffer of raw FastQ bytes one line at a time and
+ * counts the records, and the records with a sequence longer than a cutoff.
+ * The position within the current record is carried between calls in a
+ * (line, length, total_records, total_targets) state tuple, so a file can be
+ * fed in chunks of any size without copying the tail of the previous chunk.
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <stdint.h>
+#include <string.h>
+
+/* the AVX2 kernel is compiled with a target attribute and selected at
+   import time, so the extension still loads on CPUs without AVX2 */
+#if (defined(__GNUC__) || defined(__clang__)) && (defined(__x86_64__) || defined(__i386__))
+#define HAVE_AVX2_KERNEL 1
+#include <immintrin.h>
+#endif
+
+typedef struct {
+    int line;                       /* line of the current record, 0 to 3 */
+    Py_ssize_t length;              /* bytes of the sequence line seen so far */
+    unsigned long long records;
+    unsigned long long targets;
+} counter_state;
+
+typedef void (*counter_kernel)(const char *, const char *, Py_ssize_t,
+                               counter_state *);
+
+/* bytes of sequence between start and stop, a trailing \r (Windows line
+   ending) is not part of the sequence */
+static inline Py_ssize_t
+sequence_bytes(const char *start, const char *stop)
+{
+    Py_ssize_t n = stop - start;
+    if (n > 0 && stop[-1] == '\r')
+        n--;
+    return n;
+}
+
+/* the line that began at start ends with the \n at nl */
+static inline void
+end_line(counter_state *s, const char *start, const char *nl, Py_ssize_t cutoff)
+{
+    if (s->line == 1) {
+        s->length += sequence_bytes(start, nl);
+        s->records++;
+        if (s->length > cutoff)
+            s->targets++;
+        s->length = 0;
+    }
+    s->line = (s->line + 1) & 3;
+}
+
+static void
+count_scalar(const char *p, const char *end, Py_ssize_t cutoff, counter_state *s)
+{
+    while (p < end) {
+        const char *nl = memchr(p, '\n', end - p);
+        if (!nl) {
+            /* the line continues in the next chunk */
+            if (s->line == 1)
+                s->length += sequence_bytes(p, end);
+            break;
+        }
+        end_line(s, p, nl, cutoff);
+        p = nl + 1;
+    }
+}
+
+#ifdef HAVE_AVX2_KERNEL
+/* compares 32 bytes at a time against \n and walks the set bits of the
+   resulting mask, the last partial block is left to count_scalar */
+__attribute__((target("avx2")))
+static void
+count_avx2(const char *p, const char *end, Py_ssize_t cutoff, counter_state *s)
+{
+    const __m256i newline = _mm256_set1_epi8('\n');
+    const char *start = p;          /* start of the current line */
+
+    for (; end - p >= 32; p += 32) {
+        __m256i block = _mm256_loadu_si256((const __m256i *)p);
+        uint32_t mask = (uint32_t)_mm256_movemask_epi8(
+            _mm256_cmpeq_epi8(block, newline));
+        while (mask) {
+            const char *nl = p + __builtin_ctz(mask);
+            end_line(s, start, nl, cutoff);
+            start = nl + 1;
+            mask &= mask - 1;       /* clear the lowest set bit */
+        }
+    }
+    count_scalar(start, end, cutoff, s);
+}
+#endif
+
+static counter_kernel kernel = count_scalar;
+
+static PyObject *
+count_records(PyObject *self, PyObject *args)
+{
+    Py_buffer view;
+    Py_ssize_t cutoff;
+    counter_state s;
+
+    if (!PyArg_ParseTuple(args, "y*n(inKK):count_records", &view, &cutoff,
+                          &s.line, &s.length, &s.records, &s.targets))
+        return NULL;
+
+    Py_BEGIN_ALLOW_THREADS
+    kernel((const char *)view.buf, (const char *)view.buf + view.len, cutoff, &s);
+    Py_END_ALLOW_THREADS
+
+    PyBuffer_Release(&view);
+    return Py_BuildValue("(inKK)", s.line, s.length, s.records, s.targets);
+}
+
+static PyMethodDef fqstat_ext_methods[] = {
+    {"count_records", count_records, METH_VARARGS,
+     "count_records(buffer, cutoff, state) -> state\n\n"
+     "Count the FastQ records in buffer and the records with a sequence\n"
+     "longer than cutoff. state is a (line, length, total_records,\n"
+     "total_targets) tuple, (0, 0, 0, 0) for the start of a file."},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef fqstat_ext_module = {
+    PyModuleDef_HEAD_INIT,
+    "_fqstat_ext",
+    "C implementation of the fqstat record counter.",
+    -1,
+    fqstat_ext_methods
+};
+
+PyMODINIT_FUNC
+PyInit__fqstat_ext(void)
+{
+#ifdef HAVE_AVX2_KERNEL
+    __builtin_cpu_init();
+    if (__builtin_cpu_supports("avx2"))
+        kernel = count_avx2;
+#endif
+    return PyModule_Create(&fqstat_ext_module);
+}
@@ -5,10 +5,39 @@ import sys
 import argparse
 import pathlib
 import json
+import os
+import fnmatch
+import gzip
+import zlib
+import contextlib
+import tempfile
+import mmap
+import queue
+import threading
+import itertools
+import collections
+import concurrent.futures
 
 # 3rd-party
-from Bio import SeqIO
-from prettytable import PrettyTable
+import numpy as np
+
+# filenames matched when no --pattern is given, only gzip is decompressed so other compressed files are left out
+FASTQ_PATTERNS = ['*.fastq', '*.fastq.gz', '*.fq', '*.fq.gz']
+# 128 KiB, the same block size used by cat and pigz, to keep read() syscalls low on large files
+BUFFER_SIZE = 131072
+# 1 MiB, the amount of a file handed to the record counter at once
+CHUNK_SIZE = 1048576
+# --pipeline lets the reader thread get up to 4 chunks ahead of the counter
+PIPELINE_DEPTH = 4
+# --fast samples the sequence lengths of up to 200 records from the first 64 KiB of a file
+SAMPLE_SIZE = 65536
+SAMPLE_RECORDS = 200
+# scan results of previous runs, keyed by path and invalidated when a file's size or modification time changes
+CACHE_PATH = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+    'fqstat',
+    'index.json',
+)
 
 
 # helper functions
@@ -20,97 +49,623 @@ def err(*args, **kwargs) -> None:
     """
     print(*args, file=sys.stderr, **kwargs)
 
-def search(root_dir: pathlib.Path, pattern: str) -> list:
-    """Generic pathlib glob wrapper.
+def _match_parts(parts: list, pattern_parts: list) -> bool:
+    """Match the segments of a relative path against the segments of a 
+       pattern, see _match.
+
+    Args:
+        parts: list of str path segments.
+        pattern_parts: list of str pattern segments.
+
+    Returns:
+        True if the path matches.
+    """
+    if not pattern_parts:
+        return not parts
+    if pattern_parts[0] == '**': # zero or more directories
+        return any(_match_parts(parts[i:], pattern_parts[1:]) for i in range(len(parts) + 1))
+    return bool(parts) and fnmatch.fnmatch(parts[0], pattern_parts[0]) and _match_parts(parts[1:], pattern_parts[1:])
+
+def _match(relative_path: str, name: str, pattern: str) -> bool:
+    """Match a file against a pattern. Patterns without a / match the 
+       filename, patterns with a / match the path relative to root_dir, as
+       Path.glob did: each /-separated segment is matched on its own, so *
+       does not cross a /, and ** matches zero or more directories.
+
+    Args:
+        relative_path: str path of the file relative to root_dir, using /.
+        name: str filename.
+        pattern: str used to match the file, see fnmatch for the syntax.
+
+    Returns:
+        True if the file matches.
+    """
+    if '/' not in pattern:
+        return fnmatch.fnmatch(name, pattern)
+    return _match_parts(relative_path.split('/'), pattern.split('/'))
+
+def search(root_dir: pathlib.Path, patterns: list):
+    """Recursively walk a directory with os.scandir, yielding the files
+       whose name matches any of the patterns. Symbolic links to 
+       directories are not followed, and directories that can not be read
+       are skipped.
 
     Args:
         root_dir: Path (pathlib) object that serves as the starting point of 
                   the search.
-        pattern: str used to match path(s) or file(s).
+        patterns: list of str used to match filename(s), or paths relative
+                  to root_dir if they contain a /, see _match. A single str
+                  is also accepted.
 
     Returns:
-        A list of matched paths.
+        A generator of matched paths as str.
     """
+    if isinstance(patterns, str): # a single pattern, iterating it would match every character on its own
+        patterns = [patterns]
     try:
-        return list(root_dir.glob(pattern))
-    except AttributeError:
-        err('Error: search: root_dir is not a Path object.')
-        raise
+        match_paths = any('/' in pattern for pattern in patterns) # only then is the relative path of each file needed
+        stack = [root_dir] # directories left to visit, scandir entries cache their type so no extra stat() is needed
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            relative_path = os.path.relpath(entry.path, root_dir).replace(os.sep, '/') if match_paths else None
+                            if any(_match(relative_path, entry.name, pattern) for pattern in patterns):
+                                yield entry.path
+            except OSError as e: # e.g. no permission, skip the directory and keep searching the rest
+                err(f'Warning: search: Skipping {directory}: {e.strerror}.')
     except TypeError:
-        err('Error: search: Path.glob may have returned an invalid value.')
+        err('Error: search: root_dir is not a valid path.')
         raise
     except Exception:
         err('Error: search: An unexpected error occurred.')
         raise
 
-def fqstat(root_dir: pathlib.Path, pattern: str, num_nucleotides: int, quiet: bool) -> None:
+@contextlib.contextmanager
+def _open(path: str):
+    """Open a FastQ file for reading raw bytes, decompressing gzipped 
+       (.gz) files on the fly.
+
+    Args:
+        path: str path of the FastQ file to open.
+
+    Yields:
+        A binary file object, closed when the with block exits.
+    """
+    with open(path, 'rb', buffering=BUFFER_SIZE) as f: # read raw bytes to skip decoding, FastQ is plain ASCII
+        if path.endswith('.gz'):
+            # GzipFile does not close a file object it is given, the outer with block does
+            with gzip.GzipFile(fileobj=f) as decompressed: # streams the decompressed data, the file is never fully inflated
+                yield decompressed
+        else:
+            yield f
+
+def _stem(path: str) -> str:
+    """Get the filename without the FastQ extension, or the .gz extension
+       of a compressed file.
+
+    Args:
+        path: str path of the FastQ file.
+
+    Returns:
+        The filename without its extension(s).
+    """
+    name = os.path.basename(path)
+    if name.endswith('.gz'):
+        name = name[:-len('.gz')]
+    return os.path.splitext(name)[0]
+
+def _count_records(buffer, cutoff: int, state: tuple) -> tuple:
+    """NumPy fallback of the C record counter, used when the _fqstat_ext 
+       extension has not been built. Finds the newlines of a whole chunk at
+       once and compares the sequence lengths as an array.
+
+    Args:
+        buffer: bytes-like object holding the next chunk of a FastQ file.
+        cutoff: int number of nucleotides used as the cutoff point.
+        state: (line, length, total_records, total_targets) tuple returned
+               by the previous call, (0, 0, 0, 0) for the start of a file.
+
+    Returns:
+        The updated (line, length, total_records, total_targets) tuple.
+    """
+    line, length, total_records, total_targets = state
+    data = np.frombuffer(buffer, dtype=np.uint8) # a view, the buffer is not copied
+
+    # a memory mapped file is one large buffer, so it is processed in slices to bound the size of the temporary arrays
+    for start in range(0, len(data), CHUNK_SIZE):
+        chunk = data[start:start + CHUNK_SIZE]
+        newlines = np.flatnonzero(chunk == 10) # positions of every \n in the chunk
+
+        if len(newlines):
+            # the length of every complete line, the first one includes the part carried over from the previous chunk
+            starts = np.empty_like(newlines)
+            starts[0] = 0
+            starts[1:] = newlines[:-1] + 1
+            lengths = newlines - starts
+            lengths -= (lengths > 0) & (chunk[newlines - 1] == 13) # a trailing \r is not part of the sequence
+            lengths[0] += length
+
+            # every 4th line, starting from the next sequence line, is a sequence
+            sequences = lengths[(1 - line) % 4::4]
+            total_records += len(sequences)
+            total_targets += int(np.count_nonzero(sequences > cutoff))
+
+            line = (line + len(newlines)) & 3 # a FastQ record is always 4 lines
+            tail = chunk[newlines[-1] + 1:]
+            length = 0
+        else:
+            tail = chunk
+
+        if line == 1 and len(tail): # the sequence line continues in the next chunk
+            length += len(tail) - int(tail[-1] == 13)
+
+    return line, length, total_records, total_targets
+
+# prefer the C record counter, see _fqstat_ext.c
+try:
+    if __package__:
+        from ._fqstat_ext import count_records
+    else: # fqstat.py was run as a script, where fqstat would name this file rather than the package
+        from _fqstat_ext import count_records
+except ImportError:
+    count_records = _count_records
+
+def _fadvise(f, advice: str) -> None:
+    """Advise the kernel how a whole file will be accessed. Does nothing 
+       on platforms without posix_fadvise, or for files that do not 
+       support it such as pipes.
+
+    Args:
+        f: binary file object, including gzip files.
+        advice: str name of a POSIX_FADV_* constant of the os module.
+
+    Returns:
+        None
+    """
+    if not hasattr(os, 'posix_fadvise'): # not available on Windows and macOS
+        return
+    try:
+        os.posix_fadvise(f.fileno(), 0, 0, getattr(os, advice)) # offset 0 and length 0 cover the whole file
+    except OSError:
+        pass
+
+def _read_chunks(f):
+    """Read a file in chunks of up to CHUNK_SIZE bytes. Raw files are read
+       with readinto into a single buffer that is reused for every chunk.
+       Gzip files are read with read(), as GzipFile.readinto only copies
+       the result of read() into the buffer.
+
+    Args:
+        f: binary file object, including gzip files.
+
+    Yields:
+        A (buffer, size) tuple per chunk, only the first size bytes of 
+        buffer are valid and they are overwritten by the next chunk.
+    """
+    if isinstance(f, gzip.GzipFile):
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk: # reached the end of the file
+                return
+            yield chunk, len(chunk)
+    else:
+        buffer = bytearray(CHUNK_SIZE)
+        while True:
+            size = f.readinto(buffer)
+            if not size: # reached the end of the file
+                return
+            yield buffer, size
+
+def _count_stream(f, num_nucleotides: int) -> tuple:
+    """Count the records of a FastQ file by reading it in chunks.
+
+    Args:
+        f: binary file object positioned at the start of the FastQ file.
+        num_nucleotides: int number of nucleotides used as the cutoff point.
+
+    Returns:
+        The final (line, length, total_records, total_targets) state of 
+        count_records.
+    """
+    _fadvise(f, 'POSIX_FADV_SEQUENTIAL') # read from start to end with read() calls, so read ahead aggressively
+    state = (0, 0, 0, 0) # (line, length, total_records, total_targets), see count_records
+    # the file is counted in chunks, the counter carries partial records over from one chunk to the next
+    for buffer, size in _read_chunks(f):
+        state = count_records(memoryview(buffer)[:size], num_nucleotides, state) # a slice of a memoryview does not copy
+    return state
+
+def _count_pipelined(f, num_nucleotides: int) -> tuple:
+    """Count the records of a FastQ file by reading it in chunks on a 
+       separate thread, so reading (and decompressing) the next chunks 
+       overlaps with counting the current one. Both release the GIL.
+
+    Args:
+        f: binary file object positioned at the start of the FastQ file.
+        num_nucleotides: int number of nucleotides used as the cutoff point.
+
+    Returns:
+        The final (line, length, total_records, total_targets) state of 
+        count_records.
+    """
+    _fadvise(f, 'POSIX_FADV_SEQUENTIAL') # the reader thread reads the file in order, see _count_stream
+    chunks = queue.Queue(maxsize=PIPELINE_DEPTH) # bounded, so the reader can not buffer the whole file
+
+    def read() -> None:
+        try:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                chunks.put(chunk) # an empty chunk tells the counter the file has ended
+                if not chunk:
+                    return
+        except Exception as e: # hand errors, such as a corrupt gzip file, over to the counter
+            chunks.put(e)
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+
+    state = (0, 0, 0, 0) # (line, length, total_records, total_targets), see count_records
+    while True:
+        chunk = chunks.get()
+        if isinstance(chunk, Exception):
+            raise chunk
+        if not chunk: # reached the end of the file
+            break
+        state = count_records(chunk, num_nucleotides, state)
+
+    reader.join()
+    return state
+
+def _count_mapped(f, num_nucleotides: int) -> tuple:
+    """Count the records of an uncompressed FastQ file by memory mapping it,
+       which lets the counter read the page cache directly instead of 
+       copying the file into chunks. Falls back to _count_stream for files
+       that can not be mapped, such as empty files and pipes.
+
+    Args:
+        f: binary file object positioned at the start of the FastQ file.
+        num_nucleotides: int number of nucleotides used as the cutoff point.
+
+    Returns:
+        The final (line, length, total_records, total_targets) state of 
+        count_records.
+    """
+    try:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError): # ValueError is raised for empty files
+        return _count_stream(f, num_nucleotides)
+
+    with mapped:
+        if hasattr(mmap, 'MADV_SEQUENTIAL'): # madvise is only available on some platforms
+            mapped.madvise(mmap.MADV_SEQUENTIAL) # the file is read once from start to end, so read ahead aggressively
+        return count_records(mapped, num_nucleotides, (0, 0, 0, 0))
+
+def _count_uniform(f, num_nucleotides: int) -> tuple:
+    """Count the records of a FastQ file whose sampled records all have 
+       the same sequence length without parsing it, by counting its lines.
+       Every record is then assumed to have that length.
+
+    Args:
+        f: binary file object positioned at the start of the FastQ file.
+        num_nucleotides: int number of nucleotides used as the cutoff point.
+
+    Returns:
+        A (total_records, total_targets) tuple, or None if the sampled 
+        sequence lengths differ.
+    """
+    _fadvise(f, 'POSIX_FADV_SEQUENTIAL') # the sample and the line count both read the file in order
+    sample = f.read(SAMPLE_SIZE)
+    lines = sample.split(b'\n')[:-1] # the last item is an incomplete (or empty) line
+    lengths = {len(seq.rstrip(b'\r')) for seq in lines[1:SAMPLE_RECORDS*4:4]}
+    if len(lengths) != 1: # mixed lengths, or not even a single record in the sample
+        return None
+
+    # bytes.count runs in C, so this is bound by reading the file rather than parsing it
+    total_lines = sample.count(b'\n')
+    last = sample[-1:]
+    for buffer, size in _read_chunks(f):
+        total_lines += buffer.count(b'\n', 0, size)
+        last = buffer[size - 1:size]
+    if last != b'\n': # the last line has no line ending
+        total_lines += 1
+
+    total_records = total_lines // 4 # a FastQ record is always 4 lines
+    total_targets = total_records if lengths.pop() > num_nucleotides else 0
+    return total_records, total_targets
+
+def _scan_one(path: str, num_nucleotides: int, fast: bool = False, pipeline: bool = False) -> tuple:
+    """Count the records of a single FastQ file and the records with 
+       nucleotides greater than a provided value. Runs inside a worker process.
+
+    Args:
+        path: str path of the FastQ file to scan.
+        num_nucleotides: int number of nucleotides used as the cutoff point.
+        fast: bool to skip parsing files whose sampled records all have the
+              same length, see _count_uniform.
+        pipeline: bool to read compressed files on a separate thread, see
+                  _count_pipelined.
+
+    Returns:
+        A (path, total_records, total_targets, estimated) tuple, estimated 
+        is True when the counts come from _count_uniform.
+    """
+    with _open(path) as f:
+        try:
+            if fast:
+                counts = _count_uniform(f, num_nucleotides)
+                if counts is not None:
+                    return (path,) + counts + (True,)
+                f.seek(0) # the sequence lengths vary, fall back to counting every record
+
+            if path.endswith('.gz') and pipeline: # compressed data has to be decompressed as a stream
+                state = _count_pipelined(f, num_nucleotides)
+            elif path.endswith('.gz'):
+                state = _count_stream(f, num_nucleotides)
+            else:
+                state = _count_mapped(f, num_nucleotides)
+        finally:
+            _fadvise(f, 'POSIX_FADV_DONTNEED') # the file is not read again, so do not let it crowd out the page cache
+
+    _, _, total_records, total_targets = state
+    return path, total_records, total_targets, False
+
+def _render(headers: list, rows: list) -> str:
+    """Format rows as a plain text table with left aligned columns.
+
+    Args:
+        headers: list of column names.
+        rows: list of rows, each a list with one value per column.
+
+    Returns:
+        The table as a str, one line per row after the header.
+    """
+    lines = [headers] + [[str(value) for value in row] for row in rows]
+    widths = [max(len(line[i]) for line in lines) for i in range(len(headers))] # each column is as wide as its widest value
+    template = '  '.join('{:<' + str(width) + '}' for width in widths)
+    return '\n'.join(template.format(*line).rstrip() for line in lines)
+
+def _load_cache() -> dict:
+    """Load the scan results of previous runs.
+
+    Returns:
+        A dictionary keyed by path, empty if there is no usable cache.
+    """
+    try:
+        with open(CACHE_PATH, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError: # first run
+        return {}
+    except (OSError, ValueError):
+        err(f'Warning: fqstat: Ignoring unreadable cache {CACHE_PATH}.')
+        return {}
+
+def _save_cache(cache: dict, root_dir: pathlib.Path = None, seen: set = None) -> None:
+    """Store the scan results for the next run. Entries without counts, 
+       and entries under root_dir of files the search did not find, are 
+       dropped so the cache does not grow forever. Entries outside of 
+       root_dir are kept as they are, without checking that their file 
+       still exists. The cache is written to a temporary file first and 
+       then replaced atomically, so an interrupted or concurrent run can not
+       leave it truncated.
+
+    Args:
+        cache: dictionary keyed by path, see _cache_entry.
+        root_dir: Path (pathlib) object the search started from.
+        seen: set of every path the search found, None if the search did
+              not finish, then no entry is dropped for being missing.
+
+    Returns:
+        None
+    """
+    prefix = os.path.join(str(root_dir), '') # the trailing separator keeps /data from matching /data2
+    for path in [
+        path for path, entry in cache.items()
+        if not entry['counts'] or (seen is not None and path.startswith(prefix) and path not in seen)
+    ]:
+        del cache[path]
+
+    temp_path = None
+    try:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(CACHE_PATH), prefix='index.', suffix='.tmp') # unique per run
+        with os.fdopen(fd, 'w', buffering=BUFFER_SIZE) as f:
+            json.dump(cache, f, separators=(',', ':')) # compact, the cache is not meant to be read by people
+        os.replace(temp_path, CACHE_PATH)
+    except OSError:
+        err(f'Warning: fqstat: Unable to write cache {CACHE_PATH}.')
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def _cache_entry(cache: dict, path: str) -> dict:
+    """Get the cache entry of a file, replacing it if the file has changed 
+       since it was stored.
+
+    Args:
+        cache: dictionary keyed by path.
+        path: str path of the FastQ file.
+
+    Returns:
+        A dictionary with the size and mtime_ns of the file, and its counts
+        keyed by the number of nucleotides as a str.
+    """
+    stat = os.stat(path)
+    entry = cache.get(path)
+    if not entry or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+        entry = cache[path] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'counts': {}, # num_nucleotides -> [total_records, total_targets]
+        }
+    return entry
+
+def _ready(counts) -> bool:
+    """Check whether the counts of a file can be written without waiting.
+
+    Args:
+        counts: [total_records, total_targets] from the cache, or the 
+                Future of a scan submitted to a worker.
+
+    Returns:
+        True if the counts are cached or the scan is done.
+    """
+    return not isinstance(counts, concurrent.futures.Future) or counts.done()
+
+def fqstat(root_dir: pathlib.Path, patterns: list, num_nucleotides: int, quiet: bool, jobs: int = None, use_cache: bool = True, fast: bool = False, pipeline: bool = False) -> None:
     """Recursively find FastQ files and report the percent of records with 
-       nucleotides greater than a provided value per file. Stores results in
-       a JSON file.
+       nucleotides greater than a provided value per file. Streams results
+       to a JSON lines file.
 
     Args:
         root_dir: Path (pathlib) object that serves as the starting point of 
                   the search.
-        pattern: str used to match path(s) or file(s).
+        patterns: list of str used to match filename(s), or a single str.
         num_nucleotides: int number of nucleotides used as the cutoff point.
         quiet: bool to prevent printing result table.
+        jobs: int number of worker processes, defaults to the number of CPUs.
+        use_cache: bool to reuse, and store, the results of unchanged files.
+        fast: bool to estimate the counts of files whose sampled records all
+              have the same length, estimates are marked in the results and
+              are not stored in the cache.
+        pipeline: bool to overlap reading and counting compressed files.
 
     Returns:
         None
     """
-    matched_paths = search(root_dir, pattern)
-    if not matched_paths: # quickly check if we should even begin the rest of the program
+    matched_paths = search(root_dir, patterns) # a generator, files are handed to the workers as they are found
+    try:
+        first_path = next(matched_paths) # quickly check if we should even begin the rest of the program
+    except StopIteration:
         sys.exit('No files found.')
+    matched_paths = itertools.chain([first_path], matched_paths)
+
+    cache = _load_cache() if use_cache else {}
+    counts_key = str(num_nucleotides) # JSON object keys are always str
+
+    output = f'scan-{num_nucleotides}_nucleotides.jsonl'
+    rows = [] # only filled when the table is printed, with --quiet memory does not grow with the number of files
+
+    # files are submitted to the workers as they are found, keeping a few per worker queued so none sit idle, and
+    # results are written as soon as the oldest one is done, so only this many files are held in memory at once
+    window = (jobs or os.cpu_count() or 1) * 4
+    pending = collections.deque() # (path, cache entry, counts or Future) in search order
+    seen = set() # every path found when caching, the cache entries of files under root_dir that are no longer found are dropped
+    searched = False # only a finished search tells which files are gone
+
+    def write_oldest() -> None:
+        path, entry, counts = pending.popleft()
+        if isinstance(counts, concurrent.futures.Future):
+            try:
+                _, total_records, total_targets, estimated = counts.result()
+            except (OSError, EOFError, zlib.error) as e: # e.g. a corrupt or truncated gzip file, skip it and keep scanning the rest
+                err(f'Warning: fqstat: Skipping {path}: {e}.')
+                return
+            if entry is not None and not estimated:
+                entry['counts'][counts_key] = [total_records, total_targets]
+        else:
+            total_records, total_targets = counts
+            estimated = False # only exact counts are cached
+
+        key = _stem(path) # get the filename, without the .fastq (and .gz) extension
+
+        f.write(json.dumps({
+            'file': key,
+            'path': path,
+            'total_targets': total_targets,
+            'total_records': total_records, # the percent is left to the reader, keeping the raw counts exact
+            'estimated': estimated, # True when --fast assumed every record has the sampled length
+        }, separators=(',', ':')) + '\n') # compact separators, no whitespace to encode or write
+
+        if not quiet:
+            rows.append((key, total_targets, total_records, estimated))
+
+    # each file is independent, so they are scanned in parallel by a pool of worker processes
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor, \
+                open(output, 'w', buffering=BUFFER_SIZE) as f:
+            for path in matched_paths:
+                try:
+                    entry = _cache_entry(cache, path) if use_cache else None
+                except OSError as e: # the file was removed, or became unreadable, after it was found
+                    err(f'Warning: fqstat: Skipping {path}: {e.strerror}.')
+                    continue
+                if use_cache:
+                    seen.add(path)
+
+                # files already in the cache are not scanned again
+                if entry and counts_key in entry['counts']:
+                    pending.append((path, entry, entry['counts'][counts_key]))
+                else:
+                    pending.append((path, entry, executor.submit(_scan_one, path, num_nucleotides, fast, pipeline)))
+
+                # results are written as JSON lines in search order, one object per file
+                while pending and (len(pending) >= window or _ready(pending[0][2])):
+                    write_oldest()
 
-    data = {} # will be used to store the data collected from all of the found files
-    for path in matched_paths: # path is a pathlib.Path object
-        with open(path, 'r') as f:
-            total_records = 0 # used to track the total number of records, due to SeqIO.parse returning a generator, can't use len()
-            total_targets = 0 # used to track the records which contain nucleotides greater than num_nucleotides
-            
-            # each record is a Bio.SeqRecord.SeqRecord object 
-            # see https://biopython.org/DIST/docs/api/Bio.SeqRecord.SeqRecord-class.html for more information
-            for record in SeqIO.parse(f, "fastq"):
-                total_records += 1 # increment the total number of records
-                if len(record.seq) > num_nucleotides: # if sequence contains greater than num_nuceoltides
-                    total_targets += 1
-
-            # get the filename, without the .fastq extension
-            key = path.stem
-
-            # store data into dictionary
-            data[key] = {
-                'path': str(path), # convert Path object to a str for serialization
-                'total_targets': total_targets,
-                'total_records': total_records,
-                'percent': round(total_targets/total_records, 4), 
-            }
-        
-    # write data to json file
-    with open(f'scan-{num_nucleotides}_nucleotides.json', 'w') as f:
-        json.dump(data, f) # convert dictionary to json file
-
-    if not quiet:
-        table = PrettyTable() # library to provide a fancy table for easy reading
-
-        # initialize the header row 
-        table.field_names = [ 
-            'File',
-            'Total Targets',
-            'Total Records',
-            f'Percent (> {num_nucleotides} Nucleotides)',
-        ]
-
-        # append rows to the table object
-        for key, value in data.items(): 
-            table.add_row([
-                key,
-                value['total_targets'],
-                value['total_records'],
-                f"{value['percent']*100}%", # convert to easily readable percentage
-            ])
-
-        print(table) # display results table
+            searched = True
+            while pending: # the search is done, wait for the remaining files
+                write_oldest()
+    finally:
+        if use_cache: # also when a file fails or the run is interrupted, so the scans already done are kept
+            _save_cache(cache, root_dir, seen if searched else None)
+
+    if not quiet and rows: # every file may have been skipped
+        # pack the rows into a structured array, one record per file, so the percentages are computed in a single vectorized pass
+        results = np.array(rows, dtype=[
+            ('file', f'U{max(len(row[0]) for row in rows)}'), # wide enough for the longest filename
+            ('total_targets', np.uint64),
+            ('total_records', np.uint64),
+            ('estimated', np.bool_),
+        ])
+        percents = np.round(np.divide(
+            results['total_targets'],
+            results['total_records'],
+            out=np.zeros(len(results)),
+            where=results['total_records'] > 0, # a file without records is reported as 0%
+        ), 4)
+
+        table = _render(
+            [
+                'File',
+                'Total Targets',
+                'Total Records',
+                f'Percent (> {num_nucleotides} Nucleotides)',
+            ],
+            [
+                [
+                    result['file'],
+                    result['total_targets'],
+                    result['total_records'],
+                    f"{'~' if result['estimated'] else ''}{percent*100}%", # convert to easily readable percentage, ~ marks an estimate
+                ]
+                for result, percent in zip(results, percents)
+            ],
+        )
+
+        if results['estimated'].any():
+            table += '\n~ estimated by --fast from the length of the first records'
+
+        sys.stdout.write(table + '\n') # display results table in a single write
+
+def _positive_int(value: str) -> int:
+    """argparse type for flags that need a number greater than 0.
+
+    Args:
+        value: str given on the command-line.
+
+    Returns:
+        The value as an int.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be greater than 0: '{value}'")
+    return number
 
 def cli() -> None:
     """Main entry-point for the fqstat command-line interface.
@@ -136,8 +691,11 @@ def cli() -> None:
     parser.add_argument(
         '--pattern', # name of the optional flag
         type=str,
-        default='**/*.fastq', # by default, ** will cause Path.glob to recursively search
-        help="a pattern used to match files",
+        action='append', # may be given more than once, a file is scanned if any of the patterns match
+        default=argparse.SUPPRESS, # the default is FASTQ_PATTERNS, suppressed so appending does not extend it
+        metavar='PATTERN',
+        dest='patterns',
+        help=f"a pattern used to match filenames, or paths relative to root_dir if it contains a /, defaults to {' '.join(FASTQ_PATTERNS)}",
     )
     parser.add_argument(
         '--nucleotides',
@@ -152,12 +710,36 @@ def cli() -> None:
         action='store_true', # false by default, using --quiet disables printing results
         help="do not print results",
     )
+    parser.add_argument(
+        '--jobs',
+        type=_positive_int, # ProcessPoolExecutor needs at least 1 worker
+        default=argparse.SUPPRESS, # not given means None, which lets ProcessPoolExecutor use every available CPU
+        metavar='INT',
+        help="number of files to scan in parallel, defaults to the number of CPUs",
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_false', # the cache is used by default, using --no-cache scans every file again
+        default=argparse.SUPPRESS, # keeps "(default: True)" of use_cache out of -h, where it reads as if --no-cache were on
+        dest='use_cache',
+        help="do not reuse or store the results of unchanged files",
+    )
+    parser.add_argument(
+        '--fast',
+        action='store_true',
+        help="when the first records of a file all have the same length, count lines instead of parsing records; the counts of such files are estimates, marked with ~ and \"estimated\": true",
+    )
+    parser.add_argument(
+        '--pipeline',
+        action='store_true',
+        help="decompress gzipped files on a separate thread while counting, helps on slow disks and network storage",
+    )
 
     # parse argv and return a Namespace object containing the keywords and their values
     args = parser.parse_args()
 
     # call the core program
-    fqstat(args.root_dir, args.pattern, args.num_nucleotides, args.quiet)
+    fqstat(args.root_dir, getattr(args, 'patterns', FASTQ_PATTERNS), args.num_nucleotides, args.quiet, getattr(args, 'jobs', None), getattr(args, 'use_cache', True), args.fast, args.pipeline)
 
 if __name__ == '__main__':
     cli()
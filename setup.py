@@ -19,8 +19,15 @@ setuptools.setup(
             'fqstat = fqstat.fqstat:cli',
         ]
     },
+    ext_modules=[
+        # optional, fqstat falls back to a pure Python record counter if it cannot be compiled
+        setuptools.Extension(
+            'fqstat._fqstat_ext',
+            sources=['fqstat/_fqstat_ext.c'],
+            optional=True,
+        ),
+    ],
     install_requires=[
-        'biopython',
-        'prettytable',
+        'numpy',
     ],
 )
\ No newline at end of file
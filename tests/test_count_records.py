@@ -0,0 +1,108 @@
+"""Differential tests of the record counters.
+
+The same random FastQ data is fed to the C extension, when it is built, and
+to the NumPy fallback in chunks of every size from 1 to 100 bytes, and both
+are compared against a count made by splitting the data into lines. Chunks
+shorter than 32 bytes are counted by the scalar kernel of the C extension,
+longer ones mostly by the AVX2 kernel on CPUs that support it.
+"""
+
+# standard library
+import random
+import unittest
+import unittest.mock
+
+from fqstat import fqstat
+
+try:
+    from fqstat import _fqstat_ext
+except ImportError: # the extension has not been built, only the NumPy fallback is tested
+    _fqstat_ext = None
+
+CHUNK_SIZES = range(1, 101)
+CUTOFF = 30
+
+
+def reference(data: bytes, cutoff: int) -> tuple:
+    """Count the records of a FastQ file line by line.
+
+    Args:
+        data: bytes of the whole FastQ file.
+        cutoff: int number of nucleotides used as the cutoff point.
+
+    Returns:
+        A (total_records, total_targets) tuple.
+    """
+    lines = data.split(b'\n')[:-1] # a record is only counted once its sequence line has ended
+    sequences = [line[:-1] if line.endswith(b'\r') else line for line in lines[1::4]]
+    return len(sequences), sum(len(sequence) > cutoff for sequence in sequences)
+
+def random_fastq(rng: random.Random, newline: bytes, final_newline: bool) -> bytes:
+    """Make a FastQ file of records with random sequence lengths around
+       the cutoff.
+
+    Args:
+        rng: Random object to draw from.
+        newline: bytes line ending, \\n or \\r\\n.
+        final_newline: bool to end the last line with a line ending.
+
+    Returns:
+        The bytes of the FastQ file.
+    """
+    records = []
+    for i in range(rng.randint(0, 12)):
+        sequence = bytes(rng.choice(b'ACGTN') for _ in range(rng.randint(0, 2 * CUTOFF)))
+        records.append(newline.join([b'@read%d' % i, sequence, b'+', b'I' * len(sequence)]) + newline)
+    data = b''.join(records)
+    if data and not final_newline:
+        data = data[:-len(newline)]
+    return data
+
+def count_in_chunks(count_records, data: bytes, chunk_size: int) -> tuple:
+    """Count the records of data with a record counter, chunk_size bytes at
+       a time.
+
+    Returns:
+        The final (line, length, total_records, total_targets) state.
+    """
+    state = (0, 0, 0, 0)
+    for start in range(0, len(data), chunk_size):
+        state = count_records(data[start:start + chunk_size], CUTOFF, state)
+    return state
+
+
+class CountRecordsTest(unittest.TestCase):
+
+    def counters(self) -> list:
+        counters = [fqstat._count_records]
+        if _fqstat_ext is not None:
+            counters.append(_fqstat_ext.count_records)
+        return counters
+
+    def check(self, seed: int) -> None:
+        rng = random.Random(seed)
+        for newline in (b'\n', b'\r\n'):
+            for final_newline in (True, False):
+                data = random_fastq(rng, newline, final_newline)
+                expected = reference(data, CUTOFF)
+                whole = fqstat._count_records(data, CUTOFF, (0, 0, 0, 0))
+                self.assertEqual(whole[2:], expected)
+                for count_records in self.counters():
+                    for chunk_size in CHUNK_SIZES:
+                        with self.subTest(counter=count_records.__module__, newline=newline, final_newline=final_newline, chunk_size=chunk_size):
+                            # every chunking has to end in the same state, including the partial last line
+                            self.assertEqual(count_in_chunks(count_records, data, chunk_size), whole)
+
+    def test_chunk_sizes(self):
+        for seed in range(5):
+            self.check(seed)
+
+    def test_fallback_slices(self):
+        # the NumPy fallback slices large buffers by CHUNK_SIZE, make the slices small enough to split records
+        with unittest.mock.patch.object(fqstat, 'CHUNK_SIZE', 7):
+            for seed in range(5, 8):
+                self.check(seed)
+
+
+if __name__ == '__main__':
+    unittest.main()